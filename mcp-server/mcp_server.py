@@ -14,6 +14,16 @@ import os
 import sys
 import logging
 
+# Wrapper log output goes to stdout through one handler instead of print(flush=True).
+# The logger has its own name and does not propagate, so it stays separate from
+# excel_mcp's file logging.
+_log = logging.getLogger("excel-mcp-agentcore")
+_log.setLevel(logging.INFO)
+_log.propagate = False
+_log_handler = logging.StreamHandler(sys.stdout)
+_log_handler.setFormatter(logging.Formatter("%(message)s"))
+_log.addHandler(_log_handler)
+
 # ============================================================
 # STEP 1: Patch logging.FileHandler BEFORE importing excel_mcp
 # ============================================================
@@ -26,7 +36,7 @@ def _patched_file_handler_init(
     """Redirect any /var/* log files to /tmp/"""
     if filename.startswith("/var/"):
         filename = "/tmp/" + os.path.basename(filename)
-        print(f"[PATCH] Redirecting log file to: {filename}", flush=True)
+        _log.info(f"[PATCH] Redirecting log file to: {filename}")
     _original_file_handler_init(self, filename, mode, encoding, delay, errors)
 
 
@@ -44,10 +54,11 @@ os.makedirs("/tmp/excel_files", exist_ok=True)
 S3_BUCKET = os.environ.get("EXCEL_S3_BUCKET", "")  # Set your bucket name here or via env var
 S3_PREFIX = os.environ.get("EXCEL_S3_PREFIX", "excel-downloads/")  # S3 key prefix
 PRESIGNED_URL_EXPIRY = int(os.environ.get("PRESIGNED_URL_EXPIRY", "3600"))  # 1 hour default
+AWS_REGION = os.environ.get("AWS_REGION") or os.environ.get("AWS_DEFAULT_REGION")  # Set by AgentCore
 
-print("Starting Excel MCP Server for AgentCore...", flush=True)
-print(f"EXCEL_FILES_PATH: {os.environ['EXCEL_FILES_PATH']}", flush=True)
-print(f"Python version: {sys.version}", flush=True)
+_log.info("Starting Excel MCP Server for AgentCore...")
+_log.info(f"EXCEL_FILES_PATH: {os.environ['EXCEL_FILES_PATH']}")
+_log.info(f"Python version: {sys.version}")
 
 # ============================================================
 # STEP 3: Create FastMCP server with AgentCore settings
@@ -63,7 +74,7 @@ mcp = FastMCP(
 )
 
 # Import excel_mcp tools and register them
-print("Loading excel_mcp tools...", flush=True)
+_log.info("Loading excel_mcp tools...")
 
 try:
     from excel_mcp import server as excel_server
@@ -74,17 +85,14 @@ try:
     if hasattr(original_mcp, "_tool_manager") and hasattr(
         original_mcp._tool_manager, "_tools"
     ):
-        for tool_name, tool_func in original_mcp._tool_manager._tools.items():
-            print(f"  Registering tool: {tool_name}", flush=True)
-            mcp._tool_manager._tools[tool_name] = tool_func
+        tools = original_mcp._tool_manager._tools
+        mcp._tool_manager._tools.update(tools)
+        _log.info(f"  Registered {len(tools)} tools: {', '.join(tools)}")
 
-    print("Excel MCP tools loaded successfully", flush=True)
+    _log.info("Excel MCP tools loaded successfully")
 
 except Exception as e:
-    print(f"Error loading excel_mcp tools: {e}", flush=True)
-    import traceback
-
-    traceback.print_exc()
+    _log.exception(f"Error loading excel_mcp tools: {e}")
 
     # Fallback: create a simple test tool
     @mcp.tool()
@@ -92,14 +100,128 @@ except Exception as e:
         """A simple test tool"""
         return f"Test response: {message}"
 
-    print("Fallback: registered test_tool", flush=True)
+    _log.info("Fallback: registered test_tool")
 
 # ============================================================
 # STEP 4: Add S3 download tool
 # ============================================================
-import boto3
+import json
+import orjson
+import time
 from botocore.exceptions import ClientError
-from datetime import datetime
+from fast_s3_url import FastS3UrlSigner
+from fast_s3_url.util import get_credentials_from_boto3_client
+from functools import lru_cache
+from io import BytesIO
+from openpyxl import Workbook
+from urllib.parse import quote
+
+
+# FastMCP wraps tool results in TextContent and serializes the JSON-RPC envelope
+# itself, so tools must return str; encode once with orjson and decode once.
+def _dumps(obj) -> str:
+    """Serialize a tool response to a JSON string (orjson is much faster than json)"""
+    try:
+        return orjson.dumps(obj).decode("utf-8")
+    except orjson.JSONEncodeError:
+        # orjson rejects lone surrogates, which os.scandir yields for non-UTF-8
+        # filenames (e.g. GBK names from unzipped archives); json escapes them
+        return json.dumps(obj)
+
+
+_S3_CLIENT = None
+
+
+def _s3():
+    """Return a shared S3 client (boto3 client construction is expensive)"""
+    global _S3_CLIENT
+    if _S3_CLIENT is None:
+        # Deferred until the first S3 call: importing boto3 adds noticeably to cold start
+        import boto3
+        from botocore.config import Config
+        
+        # Explicit region and signing settings skip region/endpoint resolution
+        _S3_CLIENT = boto3.session.Session(region_name=AWS_REGION).client(
+            "s3",
+            config=Config(
+                signature_version="s3v4",
+                s3={"addressing_style": "virtual"},
+                retries={"max_attempts": 2, "mode": "standard"},
+            ),
+        )
+    return _S3_CLIENT
+
+
+_SIGNER = None
+
+
+def _signer():
+    """Return a local SigV4 URL signer, rebuilt whenever the client's credentials rotate"""
+    global _SIGNER
+    credentials = get_credentials_from_boto3_client(_s3())
+    if _SIGNER is None or _SIGNER.credentials != credentials:
+        _SIGNER = FastS3UrlSigner.from_boto3_client(_s3(), S3_BUCKET)
+    return _SIGNER
+
+
+# Files up to this size are sent with a single put_object call, skipping the
+# transfer manager's executor setup (typical generated workbooks are tiny)
+PUT_OBJECT_MAX_BYTES = 8 * 1024 * 1024
+
+
+def _upload_file(s3_client, f, s3_key: str, content_disposition: str):
+    """Upload an Excel file object (opened file or BytesIO) to S3_BUCKET under s3_key"""
+    extra_args = {
+        "ContentType": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+        "ContentDisposition": content_disposition
+    }
+    size = f.seek(0, os.SEEK_END)
+    f.seek(0)
+    if size <= PUT_OBJECT_MAX_BYTES:
+        s3_client.put_object(Bucket=S3_BUCKET, Key=s3_key, Body=f.read(), **extra_args)
+    else:
+        s3_client.upload_fileobj(f, S3_BUCKET, s3_key, ExtraArgs=extra_args)
+
+
+@lru_cache(maxsize=1024)
+def _content_disposition(filename: str) -> str:
+    """Content-Disposition header with the URL encoded filename (RFC 5987)"""
+    return f"attachment; filename*=UTF-8''{quote(filename, safe='')}"
+
+
+# The success response schema is fixed, so the constant fields are encoded once
+_OK_PREFIX = (
+    b'{"success":true,"s3_bucket":' + orjson.dumps(S3_BUCKET)
+    + b',"expires_in_seconds":' + orjson.dumps(PRESIGNED_URL_EXPIRY)
+)
+
+
+def _upload_and_sign(f, filename: str, message: str) -> str:
+    """Upload an Excel file object to S3 and return the success JSON with a presigned URL
+
+    The download URL is appended to message to form the response's "message" field.
+    """
+    timestamp = time.strftime("%Y%m%d_%H%M%S")
+    s3_key = f"{S3_PREFIX}{timestamp}_{filename}"
+    
+    _upload_file(_s3(), f, s3_key, _content_disposition(filename))
+    
+    # Generate presigned URL (ContentDisposition is stored on the object, so no
+    # response override is needed)
+    download_url = _signer().generate_presigned_get_object_urls(
+        [s3_key], expires_in=PRESIGNED_URL_EXPIRY
+    )[0]
+    
+    _log.info(f"[S3] Uploaded {filename} to s3://{S3_BUCKET}/{s3_key}")
+    
+    return b"".join((
+        _OK_PREFIX,
+        b',"download_url":', orjson.dumps(download_url),
+        b',"filename":', orjson.dumps(filename),
+        b',"s3_key":', orjson.dumps(s3_key),
+        b',"message":', orjson.dumps(message + download_url),
+        b"}",
+    )).decode("utf-8")
 
 
 @mcp.tool()
@@ -114,10 +236,8 @@ def upload_to_s3_and_get_download_url(filepath: str, custom_filename: str = "")
     Returns:
         JSON string with download URL or error message
     """
-    import json
-    
     if not S3_BUCKET:
-        return json.dumps({
+        return _dumps({
             "success": False,
             "error": "S3_BUCKET not configured. Set EXCEL_S3_BUCKET environment variable."
         })
@@ -129,73 +249,36 @@ def upload_to_s3_and_get_download_url(filepath: str, custom_filename: str = "")
     else:
         full_path = filepath
     
-    # Check if file exists
-    if not os.path.exists(full_path):
-        return json.dumps({
-            "success": False,
-            "error": f"File not found: {filepath}"
-        })
-    
     try:
-        from urllib.parse import quote
-        
-        s3_client = boto3.client("s3")
-        
-        # Generate S3 key
         filename = custom_filename if custom_filename else os.path.basename(filepath)
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        s3_key = f"{S3_PREFIX}{timestamp}_{filename}"
-        
-        # URL encode filename for Content-Disposition header (RFC 5987)
-        encoded_filename = quote(filename, safe='')
-        content_disposition = f"attachment; filename*=UTF-8''{encoded_filename}"
-        
-        # Upload to S3
-        s3_client.upload_file(
-            full_path,
-            S3_BUCKET,
-            s3_key,
-            ExtraArgs={
-                "ContentType": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                "ContentDisposition": content_disposition
-            }
-        )
         
-        # Generate presigned URL
-        download_url = s3_client.generate_presigned_url(
-            "get_object",
-            Params={
-                "Bucket": S3_BUCKET,
-                "Key": s3_key,
-                "ResponseContentDisposition": content_disposition
-            },
-            ExpiresIn=PRESIGNED_URL_EXPIRY
-        )
-        
-        print(f"[S3] Uploaded {filepath} to s3://{S3_BUCKET}/{s3_key}", flush=True)
+        # Let open() report a missing file; no separate exists() stat beforehand
+        try:
+            f = open(full_path, "rb")
+        except FileNotFoundError:
+            return _dumps({
+                "success": False,
+                "error": f"File not found: {filepath}"
+            })
         
-        return json.dumps({
-            "success": True,
-            "download_url": download_url,
-            "filename": filename,
-            "s3_bucket": S3_BUCKET,
-            "s3_key": s3_key,
-            "expires_in_seconds": PRESIGNED_URL_EXPIRY,
-            "message": f"文件已上传，点击链接下载: {download_url}"
-        })
+        with f:
+            return _upload_and_sign(f, filename, "文件已上传，点击链接下载: ")
         
     except ClientError as e:
-        return json.dumps({
+        return _dumps({
             "success": False,
             "error": f"S3 error: {str(e)}"
         })
     except Exception as e:
-        return json.dumps({
+        return _dumps({
             "success": False,
             "error": f"Unexpected error: {str(e)}"
         })
 
 
+_EXCEL_EXTS = frozenset({".xlsx", ".xls"})
+
+
 @mcp.tool()
 def list_excel_files() -> str:
     """
@@ -204,39 +287,43 @@ def list_excel_files() -> str:
     Returns:
         JSON string with list of available Excel files
     """
-    import json
-    
     excel_files_path = os.environ.get("EXCEL_FILES_PATH", "/tmp/excel_files")
     
     try:
         files = []
-        if os.path.exists(excel_files_path):
-            for f in os.listdir(excel_files_path):
-                if f.endswith((".xlsx", ".xls")):
-                    full_path = os.path.join(excel_files_path, f)
-                    files.append({
-                        "filename": f,
-                        "size_bytes": os.path.getsize(full_path),
-                        "modified": datetime.fromtimestamp(
-                            os.path.getmtime(full_path)
-                        ).isoformat()
-                    })
+        try:
+            # scandir yields one stat per entry instead of listdir + getsize + getmtime
+            with os.scandir(excel_files_path) as entries:
+                for entry in entries:
+                    name = entry.name
+                    dot = name.rfind(".")
+                    if dot >= 0 and name[dot:].lower() in _EXCEL_EXTS and entry.is_file():
+                        st = entry.stat()
+                        files.append({
+                            "filename": name,
+                            "size_bytes": st.st_size,
+                            "modified": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(st.st_mtime))
+                        })
+        except FileNotFoundError:
+            pass
         
-        return json.dumps({
+        return _dumps({
             "success": True,
             "files": files,
             "count": len(files),
             "directory": excel_files_path
         })
     except Exception as e:
-        return json.dumps({
+        return _dumps({
             "success": False,
             "error": str(e)
         })
 
 
 @mcp.tool()
-def create_workbook_and_upload(filename: str, data: list = None, sheet_name: str = "Sheet1") -> str:
+def create_workbook_and_upload(
+    filename: str, data: list = None, sheet_name: str = "Sheet1", also_save_local: bool = False
+) -> str:
     """
     Create a new Excel workbook, optionally write data, and upload to S3 for download.
     This is a convenience tool that combines create_workbook, write_data_to_excel, and upload_to_s3_and_get_download_url.
@@ -245,99 +332,59 @@ def create_workbook_and_upload(filename: str, data: list = None, sheet_name: str
         filename: Name of the Excel file (e.g., "报价查询.xlsx")
         data: Optional list of lists containing data to write (e.g., [["Name", "Price"], ["Item1", 100]])
         sheet_name: Name of the worksheet (default: "Sheet1")
+        also_save_local: Also keep a copy in EXCEL_FILES_PATH for the other Excel tools (default: False)
     
     Returns:
         JSON string with download URL or error message
     """
-    import json
-    from openpyxl import Workbook
-    
-    excel_files_path = os.environ.get("EXCEL_FILES_PATH", "/tmp/excel_files")
-    os.makedirs(excel_files_path, exist_ok=True)
-    
     # Ensure filename ends with .xlsx
-    if not filename.endswith(".xlsx"):
+    if filename[-5:] != ".xlsx":
         filename = filename + ".xlsx"
     
-    filepath = os.path.join(excel_files_path, filename)
-    
     try:
-        # Create workbook
-        wb = Workbook()
-        ws = wb.active
-        ws.title = sheet_name
+        # Create workbook (write-only mode streams rows instead of keeping Cell objects)
+        wb = Workbook(write_only=True)
+        ws = wb.create_sheet(sheet_name)
         
         # Write data if provided
         if data:
-            for row_idx, row_data in enumerate(data, start=1):
-                for col_idx, value in enumerate(row_data, start=1):
-                    ws.cell(row=row_idx, column=col_idx, value=value)
+            for row_data in data:
+                ws.append(row_data)
+        
+        # Save workbook in memory; it only touches disk if a local copy is requested
+        buf = BytesIO()
+        wb.save(buf)
+        _log.info(f"[CREATE] Created workbook: {filename}")
         
-        # Save workbook
-        wb.save(filepath)
-        print(f"[CREATE] Created workbook: {filepath}", flush=True)
+        if also_save_local:
+            excel_files_path = os.environ.get("EXCEL_FILES_PATH", "/tmp/excel_files")
+            os.makedirs(excel_files_path, exist_ok=True)
+            filepath = os.path.join(excel_files_path, filename)
+            with open(filepath, "wb") as f:
+                f.write(buf.getbuffer())
+            _log.info(f"[CREATE] Saved local copy: {filepath}")
         
         # Upload to S3
         if not S3_BUCKET:
-            return json.dumps({
+            return _dumps({
                 "success": False,
                 "error": "S3_BUCKET not configured"
             })
         
-        from urllib.parse import quote
-        
-        s3_client = boto3.client("s3")
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        s3_key = f"{S3_PREFIX}{timestamp}_{filename}"
-        
-        # URL encode filename for Content-Disposition header (RFC 5987)
-        encoded_filename = quote(filename, safe='')
-        content_disposition = f"attachment; filename*=UTF-8''{encoded_filename}"
-        
-        s3_client.upload_file(
-            filepath,
-            S3_BUCKET,
-            s3_key,
-            ExtraArgs={
-                "ContentType": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                "ContentDisposition": content_disposition
-            }
-        )
-        
-        download_url = s3_client.generate_presigned_url(
-            "get_object",
-            Params={
-                "Bucket": S3_BUCKET,
-                "Key": s3_key,
-                "ResponseContentDisposition": content_disposition
-            },
-            ExpiresIn=PRESIGNED_URL_EXPIRY
-        )
-        
-        print(f"[S3] Uploaded to s3://{S3_BUCKET}/{s3_key}", flush=True)
-        
-        return json.dumps({
-            "success": True,
-            "download_url": download_url,
-            "filename": filename,
-            "s3_bucket": S3_BUCKET,
-            "s3_key": s3_key,
-            "expires_in_seconds": PRESIGNED_URL_EXPIRY,
-            "message": f"Excel文件已创建并上传，点击链接下载: {download_url}"
-        })
+        return _upload_and_sign(buf, filename, "Excel文件已创建并上传，点击链接下载: ")
         
     except Exception as e:
-        return json.dumps({
+        return _dumps({
             "success": False,
             "error": f"Error: {str(e)}"
         })
 
 
-print(f"S3 download tool registered (bucket: {S3_BUCKET or 'NOT SET'})", flush=True)
+_log.info(f"S3 download tool registered (bucket: {S3_BUCKET or 'NOT SET'})")
 
 # ============================================================
 # STEP 5: Run the server
 # ============================================================
 if __name__ == "__main__":
-    print("Starting MCP server on 0.0.0.0:8000/mcp (stateless_http=True)...", flush=True)
+    _log.info("Starting MCP server on 0.0.0.0:8000/mcp (stateless_http=True)...")
     mcp.run(transport="streamable-http")